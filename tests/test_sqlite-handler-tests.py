@@ -1,5 +1,7 @@
 import unittest
 import sqlite3
+import tempfile
+import time
 from unittest.mock import patch, MagicMock
 from udbp.Handlers.SQLiteHandler import SQLiteHandler
 
@@ -86,5 +88,175 @@ class TestSQLiteHandler(unittest.TestCase):
         self.assertEqual(result[0].name, 'John')
         self.assertEqual(result[0].age, 30)
 
+
+class TestSQLiteHandlerStaging(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        patcher = patch('udbp.Handlers.SQLiteHandler.SQLITE_PATH', f"{self.tmpdir.name}/")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.config = {'staging': True, 'staging_max_rows': 3, 'staging_flush_interval': 60}
+        self.handler = SQLiteHandler('staged', self.config)
+        self.handler.initialize()
+        self.handler.create_model('User', {'id': 'Integer', 'name': 'String', 'age': 'Integer'})
+
+    def tearDown(self):
+        self.handler.close()
+        self.tmpdir.cleanup()
+
+    def _disk_count(self):
+        self.handler.cursor.execute('SELECT COUNT(*) FROM main.User')
+        return self.handler.cursor.fetchone()[0]
+
+    def _wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_rejects_invalid_staging_settings(self):
+        for key, value in [('staging_max_rows', 0), ('staging_flush_interval', 0),
+                           ('staging_flush_interval', None), ('staging_max_rows', -1)]:
+            with self.subTest(key=key, value=value):
+                with self.assertRaises(ValueError):
+                    SQLiteHandler('staged', {**self.config, key: value})
+
+    def test_store_data_is_staged(self):
+        self.handler.store_data('User', {'name': 'Alice', 'age': 30})
+
+        self.assertEqual(self._disk_count(), 0)
+        self.assertEqual(self.handler.staged_rows, 1)
+
+    def test_retrieve_data_merges_staged_rows(self):
+        self.handler.store_data('User', {'name': 'Alice', 'age': 30})
+        self.handler.flush()
+        self.handler.store_data('User', {'name': 'Bob', 'age': 30})
+        self.handler.store_data('User', {'name': 'Carol', 'age': 25})
+
+        result = self.handler.retrieve_data('User', {'age': 30})
+
+        self.assertEqual([user.name for user in result], ['Alice', 'Bob'])
+        self.assertEqual(result[0].id, 1)
+        self.assertIsNone(result[1].id)
+
+    def test_flush_moves_rows_to_disk(self):
+        self.handler.store_data('User', {'name': 'Alice', 'age': 30})
+        self.handler.store_data('User', {'name': 'Bob', 'age': 25})
+
+        self.handler.flush()
+
+        self.assertEqual(self._disk_count(), 2)
+        self.assertEqual(self.handler.staged_rows, 0)
+        result = self.handler.retrieve_data('User')
+        self.assertEqual([(user.id, user.name) for user in result], [(1, 'Alice'), (2, 'Bob')])
+
+    def test_failed_flush_only_keeps_that_models_rows(self):
+        self.handler.create_model('Page', {'id': 'Integer', 'url': 'String'})
+        self.handler.store_data('Page', {'url': 'http://example.com'})
+        self.handler.store_data('User', {'name': 'Alice', 'age': 30})
+        connection = sqlite3.connect(f"{self.tmpdir.name}/staged.db")
+        connection.execute('DROP TABLE Page')
+        connection.close()
+
+        with self.assertRaises(sqlite3.OperationalError):
+            self.handler.flush()
+
+        self.assertFalse(self.handler.connection.in_transaction)
+        self.assertEqual(self._disk_count(), 1)
+        self.assertEqual(self.handler.staged_rows, 1)
+        self.handler.cursor.execute('SELECT url FROM staging.Page')
+        self.assertEqual(self.handler.cursor.fetchall(), [('http://example.com',)])
+
+        self.handler.cursor.execute(self.handler.models['Page'].create_table())
+        self.handler.flush()
+        self.handler.cursor.execute('SELECT url FROM main.Page')
+        self.assertEqual(self.handler.cursor.fetchall(), [('http://example.com',)])
+
+    def test_store_data_rejects_fields_missing_on_disk(self):
+        self.handler.create_model('Page', {'id': 'Integer', 'url': 'String'})
+        self.handler.create_model('User', {'id': 'Integer', 'name': 'String',
+                                           'age': 'Integer', 'email': 'String'})
+
+        with self.assertRaisesRegex(sqlite3.OperationalError, 'table User has no column named email'):
+            self.handler.store_data('User', {'name': 'Alice', 'age': 30, 'email': 'a@example.com'})
+
+        for i in range(7):
+            self.handler.store_data('Page', {'url': f'http://example.com/{i}'})
+        self.handler.close()
+
+        connection = sqlite3.connect(f"{self.tmpdir.name}/staged.db")
+        self.assertEqual(connection.execute('SELECT COUNT(*) FROM Page').fetchone()[0], 7)
+        self.assertEqual(connection.execute('SELECT COUNT(*) FROM User').fetchone()[0], 0)
+        connection.close()
+
+    def test_flusher_survives_failed_flush(self):
+        flush = self.handler.flush
+        self.handler.flush = MagicMock(side_effect=[sqlite3.OperationalError('database is locked')])
+        self.handler.store_data('User', {'name': 'Alice', 'age': 30})
+
+        with self.assertLogs('udbp.Handlers.SQLiteHandler', level='ERROR') as logs:
+            self.handler._flush_requested.set()
+            self._wait_for(lambda: logs.records)
+        self.assertTrue(self.handler._flusher.is_alive())
+        self.assertEqual(self.handler.staged_rows, 1)
+
+        self.handler.flush = flush
+        self.handler._flush_requested.set()
+        self._wait_for(lambda: self.handler.staged_rows == 0)
+        with self.handler.lock:
+            self.assertEqual(self._disk_count(), 1)
+
+    def test_flush_when_staging_is_full(self):
+        for name in ('Alice', 'Bob', 'Carol'):
+            self.handler.store_data('User', {'name': name, 'age': 30})
+
+        self._wait_for(lambda: self.handler.staged_rows == 0)
+        with self.handler.lock:
+            self.assertEqual(self._disk_count(), 3)
+
+    def test_store_data_flushes_inline_when_flusher_falls_behind(self):
+        self.handler._stop_flusher.set()
+        self.handler._flush_requested.set()
+        self.handler._flusher.join()
+
+        for i in range(7):
+            self.handler.store_data('User', {'name': f'user{i}', 'age': 30})
+
+        self.assertEqual(self._disk_count(), 6)
+        self.assertEqual(self.handler.staged_rows, 1)
+
+    def test_create_model_resets_staging_table(self):
+        self.handler.store_data('User', {'name': 'Alice', 'age': 30})
+
+        self.handler.create_model('User', {'id': 'Integer', 'name': 'String'})
+        self.handler.store_data('User', {'name': 'Bob'})
+
+        self.assertEqual(self._disk_count(), 1)
+        self.assertEqual(self.handler.staging_models['User'].__fields__,
+                         {'id': 'Integer', 'name': 'String'})
+        result = self.handler.retrieve_data('User')
+        self.assertEqual([user.name for user in result], ['Alice', 'Bob'])
+
+    def test_close_after_failed_flush_closes_connection(self):
+        self.handler.store_data('User', {'name': 'Alice', 'age': 30})
+        connection = self.handler.connection
+        disk = sqlite3.connect(f"{self.tmpdir.name}/staged.db")
+        disk.execute('DROP TABLE User')
+        disk.close()
+
+        with self.assertLogs('udbp.Handlers.SQLiteHandler', level='ERROR') as logs:
+            self.handler.close()
+
+        self.assertIn('Dropping 1 staged rows', logs.output[-1])
+        with self.assertRaises(sqlite3.ProgrammingError):
+            connection.execute('SELECT 1')
+
+    def test_close_flushes_staged_rows(self):
+        self.handler.store_data('User', {'name': 'Alice', 'age': 30})
+        self.handler.close()
+
+        connection = sqlite3.connect(f"{self.tmpdir.name}/staged.db")
+        self.assertEqual(connection.execute('SELECT name FROM User').fetchall(), [('Alice',)])
+        connection.close()
+
 if __name__ == '__main__':
     unittest.main()
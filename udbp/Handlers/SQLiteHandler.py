@@ -1,8 +1,10 @@
 import sqlite3
 import json
+import logging
+import threading
 from typing import Dict, Any, List, Type
 from udbp.Models.SQLiteModel import SQLiteModel
-from udbp.config import SQLITE_PATH
+from udbp.config import SQLITE_PATH, STAGING_MAX_ROWS, STAGING_FLUSH_INTERVAL
 
 class SQLiteHandler:
     def __init__(self, db_name: str, config: Dict[str, Any]):
@@ -14,10 +16,47 @@ class SQLiteHandler:
         self.cursor = None
         self.models: Dict[str, Type[SQLiteModel]] = {}
 
+        # Optional staging tier: writes land in an attached in-memory database
+        # and a background thread bulk-moves them to disk. Rows that have not
+        # been flushed yet are lost if the process dies, so the loss window is
+        # roughly staging_max_rows rows or staging_flush_interval seconds.
+        self.staging = config.get('staging', False)
+        self.staging_max_rows = config.get('staging_max_rows', STAGING_MAX_ROWS)
+        self.staging_flush_interval = config.get('staging_flush_interval', STAGING_FLUSH_INTERVAL)
+        for key in ('staging_max_rows', 'staging_flush_interval'):
+            value = getattr(self, key)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                raise ValueError(f"{key} must be a positive number, got {value!r}")
+        self.staging_models: Dict[str, Type[SQLiteModel]] = {}
+        self._staged_counts: Dict[str, int] = {}
+        self.lock = threading.RLock()
+        self._flush_requested = threading.Event()
+        self._stop_flusher = threading.Event()
+        self._flusher = None
+        self.logger = logging.getLogger(__name__)
+
     def initialize(self):
         self.connection = sqlite3.connect(f"{SQLITE_PATH}{self.db_name}.db", check_same_thread=False)
         self.cursor = self.connection.cursor()
         self._create_models_table()
+        if self.staging:
+            self._start_staging()
+
+    def _start_staging(self):
+        self.cursor.execute("ATTACH DATABASE ':memory:' AS staging")
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop_flusher.is_set():
+            self._flush_requested.wait(self.staging_flush_interval)
+            self._flush_requested.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                # flush() has already rolled back; the rows stay staged and
+                # are retried on the next pass.
+                self.logger.error(f"Error flushing staged rows to {self.db_name}: {str(e)}")
 
     def _create_models_table(self):
         self.cursor.execute(
@@ -30,22 +69,34 @@ class SQLiteHandler:
             '__fields__': fields,
             '__tablename__': name
         })
-        self.cursor.execute('INSERT OR REPLACE INTO _models (name, fields) VALUES (?, ?)',
-                            (name, json.dumps(fields)))
-        self.connection.commit()
-        
-        create_table_sql = model_class.create_table()
-        self.cursor.execute(create_table_sql)
-        self.connection.commit()
-        
-        self.models[name] = model_class
+        with self.lock:
+            if name in self.staging_models:
+                # The staging table was built from the old field list, so move
+                # its rows to disk and let the next write recreate it.
+                self._flush_model(name)
+                del self.staging_models[name]
+                self.cursor.execute(f"DROP TABLE staging.{name}")
+                self.connection.commit()
+
+            self.cursor.execute('INSERT OR REPLACE INTO _models (name, fields) VALUES (?, ?)',
+                                (name, json.dumps(fields)))
+            self.connection.commit()
+
+            create_table_sql = model_class.create_table()
+            self.cursor.execute(create_table_sql)
+            self.connection.commit()
+
+            self.models[name] = model_class
         return model_class
     
     def get_models(self) -> List[str]:
-        self.cursor.execute("SELECT name FROM _models")
-        return [row[0] for row in self.cursor.fetchall()]
+        with self.lock:
+            self.cursor.execute("SELECT name FROM _models")
+            return [row[0] for row in self.cursor.fetchall()]
 
     def store_data(self, model_name: str, data: Dict[str, Any]) -> Any:
+        if self.staging:
+            return self._stage_data(model_name, data)
         model_class = self._get_model_class(model_name)
         instance = model_class(**data)
         insert_sql, params = instance.get_insert_sql()
@@ -54,12 +105,120 @@ class SQLiteHandler:
         return self.cursor.lastrowid
 
     def retrieve_data(self, model_name: str, filters: Dict[str, Any] = None) -> List[SQLiteModel]:
+        if self.staging:
+            return self._retrieve_merged(model_name, filters)
         model_class = self._get_model_class(model_name)
         select_sql, params = model_class.get_select_sql(filters)
         self.cursor.execute(select_sql, params)
         rows = self.cursor.fetchall()
         return [model_class.from_db_row(row) for row in rows]
 
+    @property
+    def staged_rows(self) -> int:
+        return sum(self._staged_counts.values())
+
+    def _stage_data(self, model_name: str, data: Dict[str, Any]) -> None:
+        # Staged rows get their disk id only when flushed, so there is no
+        # meaningful row id to hand back here.
+        with self.lock:
+            # Backpressure: if the flusher has fallen behind, flush inline
+            # before staging more. The write only fails if this model's own
+            # rows could not be flushed.
+            if self.staged_rows >= 2 * self.staging_max_rows:
+                try:
+                    self.flush()
+                except Exception as e:
+                    if self._staged_counts.get(model_name):
+                        raise
+                    self.logger.error(f"Error flushing staged rows to {self.db_name}: {str(e)}")
+            staging_class = self._get_staging_model_class(model_name)
+            instance = staging_class(**data)
+            insert_sql, params = instance.get_insert_sql()
+            self.cursor.execute(insert_sql, params)
+            self.connection.commit()
+            self._staged_counts[model_name] = self._staged_counts.get(model_name, 0) + 1
+            if self.staged_rows >= self.staging_max_rows:
+                self._flush_requested.set()
+        return None
+
+    def _retrieve_merged(self, model_name: str, filters: Dict[str, Any] = None) -> List[SQLiteModel]:
+        with self.lock:
+            model_class = self._get_model_class(model_name)
+            select_sql, params = model_class.get_select_sql(filters)
+            self.cursor.execute(select_sql, params)
+            results = [model_class.from_db_row(row) for row in self.cursor.fetchall()]
+
+            # Staged rows have no disk id yet, so they can never match an id filter.
+            if model_name not in self.staging_models or (filters and 'id' in filters):
+                return results
+            staging_class = self.staging_models[model_name]
+            select_sql, params = staging_class.get_select_sql(filters)
+            self.cursor.execute(select_sql, params)
+            for row in self.cursor.fetchall():
+                instance = model_class.from_db_row(row)
+                if 'id' in model_class.__fields__:
+                    instance.id = None
+                results.append(instance)
+            return results
+
+    def _get_staging_model_class(self, model_name: str) -> Type[SQLiteModel]:
+        if model_name in self.staging_models:
+            return self.staging_models[model_name]
+
+        model_class = self._get_model_class(model_name)
+        # Fail now, as a direct insert would, rather than staging rows that
+        # can never be flushed to the disk table.
+        self.cursor.execute(f"PRAGMA main.table_info({model_name})")
+        disk_columns = {row[1] for row in self.cursor.fetchall()}
+        if not disk_columns:
+            raise sqlite3.OperationalError(f"no such table: {model_name}")
+        for field in model_class.__fields__:
+            if field not in disk_columns:
+                raise sqlite3.OperationalError(f"table {model_name} has no column named {field}")
+
+        staging_class = type(model_name, (model_class,), {
+            '__tablename__': f"staging.{model_name}"
+        })
+        self.cursor.execute(staging_class.create_table())
+        self.connection.commit()
+        self.staging_models[model_name] = staging_class
+        return staging_class
+
+    def flush(self):
+        """Move staged rows to disk, one transaction per model.
+
+        A model that fails to flush keeps its rows staged without holding
+        back the others; the first error is raised once every model has
+        been tried.
+        """
+        with self.lock:
+            error = None
+            for model_name in list(self.staging_models):
+                try:
+                    self._flush_model(model_name)
+                except Exception as e:
+                    error = error or e
+            if error:
+                raise error
+
+    def _flush_model(self, model_name: str):
+        with self.lock:
+            if not self._staged_counts.get(model_name):
+                return
+            model_class = self.staging_models[model_name]
+            columns = ', '.join(field for field in model_class.__fields__ if field != 'id')
+            try:
+                self.cursor.execute(
+                    f"INSERT INTO main.{model_name} ({columns}) "
+                    f"SELECT {columns} FROM staging.{model_name} ORDER BY rowid"
+                )
+                self.cursor.execute(f"DELETE FROM staging.{model_name}")
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+            self._staged_counts[model_name] = 0
+
     def _get_model_class(self, model_name: str) -> Type[SQLiteModel]:
         if model_name in self.models:
             return self.models[model_name]
@@ -77,5 +236,17 @@ class SQLiteHandler:
         return model_class
 
     def close(self):
+        if self._flusher:
+            self._stop_flusher.set()
+            self._flush_requested.set()
+            self._flusher.join()
+            self._flusher = None
         if self.connection:
-            self.connection.close()
\ No newline at end of file
+            try:
+                if self.staging:
+                    self.flush()
+            except Exception as e:
+                self.logger.error(f"Dropping {self.staged_rows} staged rows for {self.db_name}: {str(e)}")
+            finally:
+                self.connection.close()
+                self.connection = None
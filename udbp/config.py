@@ -1 +1,3 @@
 SQLITE_PATH = './sqlitedbs/'
+STAGING_MAX_ROWS = 1000
+STAGING_FLUSH_INTERVAL = 1.0